@@ -2,20 +2,41 @@
 
 import os
 import subprocess
+import time
+from collections import OrderedDict
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
-from fastapi.responses import StreamingResponse
-from pydantic import BaseModel
+from fastapi.responses import Response, StreamingResponse
+from pydantic import BaseModel, Field
 import uvicorn
 from elevenlabs.client import ElevenLabs
 from dotenv import load_dotenv
 from fastapi.middleware.cors import CORSMiddleware
+from pose_smoothing import LandmarkSmoother
+from cue_fragments import CueFragmentEngine, templated_cue
 
 # --- (Initialization and CORS Middleware remains the same) ---
 load_dotenv()
 ELEVEN_API_KEY = os.getenv("ELEVEN_API_KEY")
-app = FastAPI()
-origins = ["http://localhost:3000"]
 eleven_client = ElevenLabs(api_key=ELEVEN_API_KEY)
+
+# --- Pre-synthesized fragments for templated cues (rep counts, praise, hook error strings) ---
+DEFAULT_VOICE_ID = "cgSgspJ2msm6clMCkdW9"
+VOICE_IDS = ["wViXBPUzp2ZZixB1xQuM", DEFAULT_VOICE_ID]  # male / female, as in app/app/page.tsx
+fragment_engine = CueFragmentEngine(eleven_client)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Fragments cached on disk are ready immediately; only missing ones are synthesized
+    fragment_engine.load_from_disk(VOICE_IDS)
+    if ELEVEN_API_KEY:
+        fragment_engine.preload_in_background(VOICE_IDS)
+    else:
+        print("[FRAGMENTS] ELEVEN_API_KEY is not set, skipping fragment preload")
+    yield
+
+app = FastAPI(lifespan=lifespan)
+origins = ["http://localhost:3000"]
 app.add_middleware(CORSMiddleware, allow_origins=origins, allow_credentials=True, allow_methods=["*"], allow_headers=["*"])
 
 
@@ -28,6 +49,37 @@ class FeedbackRequest(BaseModel):
     formError: str | None = None # The specific error detected by the frontend
     voice_id: str | None = None
 
+# --- Landmark smoothing: one One-Euro filter per client session ---
+class Landmark(BaseModel):
+    x: float
+    y: float
+    z: float
+    visibility: float
+
+class LandmarkFrame(BaseModel):
+    sessionId: str
+    timestamp: float  # milliseconds, e.g. performance.now() on the client
+    landmarks: list[Landmark] = Field(min_length=33, max_length=33)
+
+# Sessions are evicted once idle, and the oldest one goes first when the cap is hit
+SMOOTHER_IDLE_SECONDS = 60
+MAX_SMOOTHER_SESSIONS = 100
+landmark_smoothers: OrderedDict[str, tuple[LandmarkSmoother, float]] = OrderedDict()
+
+def get_landmark_smoother(session_id: str) -> LandmarkSmoother:
+    now = time.monotonic()
+    smoother, _ = landmark_smoothers.pop(session_id, (None, None))
+    # Least recently seen sessions are at the front
+    while landmark_smoothers:
+        oldest_id, (_, last_seen) = next(iter(landmark_smoothers.items()))
+        if now - last_seen < SMOOTHER_IDLE_SECONDS and len(landmark_smoothers) < MAX_SMOOTHER_SESSIONS:
+            break
+        landmark_smoothers.pop(oldest_id)
+    if smoother is None:
+        smoother = LandmarkSmoother()
+    landmark_smoothers[session_id] = (smoother, now)
+    return smoother
+
 def generate_prompt(data: FeedbackRequest) -> str:
     # Base persona for the AI
     persona = "You are a supportive, expert personal trainer named Gymbro. Your reply must be only one short, encouraging sentence."
@@ -78,11 +130,21 @@ def get_llm_feedback(data: FeedbackRequest) -> str:
 # The endpoint now uses the new Pydantic model
 @app.post("/generate-voice-feedback")
 async def generate_voice_feedback(data: FeedbackRequest):
+    # Use the voice_id from the request, fallback to female if missing
+    voice_id = data.voice_id or DEFAULT_VOICE_ID
+
+    # Templated cues skip both the LLM and a fresh TTS call, but only for preloaded voices
+    # whose fragments are ready; anything else would cost serial TTS calls here
+    phrases = templated_cue(data.eventType, data.repCount, data.formError)
+    if phrases and voice_id in VOICE_IDS:
+        audio = fragment_engine.cached_cue(voice_id, phrases)
+        if audio is not None:
+            print(f"Fragments assembled: '{' '.join(phrases)}'")
+            return Response(content=audio, media_type="audio/mpeg")
+
     feedback_text = get_llm_feedback(data)
     print(f"LLM generated: '{feedback_text}'")
     try:
-        # Use the voice_id from the request, fallback to female if missing
-        voice_id = getattr(data, "voice_id", "cgSgspJ2msm6clMCkdW9")
         audio_stream = eleven_client.text_to_speech.convert(
             voice_id=voice_id,
             text=feedback_text,
@@ -92,3 +154,16 @@ async def generate_voice_feedback(data: FeedbackRequest):
     except Exception as e:
         print(f"Error with ElevenLabs: {e}")
         return {"error": "Failed to generate audio"}
+
+
+@app.post("/smooth-landmarks")
+async def smooth_landmarks(frame: LandmarkFrame):
+    smoother = get_landmark_smoother(frame.sessionId)
+    landmarks = [lm.model_dump() for lm in frame.landmarks]
+    return {"landmarks": smoother.filter_landmarks(frame.timestamp / 1000.0, landmarks)}
+
+
+@app.delete("/smooth-landmarks/{session_id}")
+async def reset_landmark_smoothing(session_id: str):
+    landmark_smoothers.pop(session_id, None)
+    return {"status": "reset"}
@@ -0,0 +1,242 @@
+"""
+Cue Fragments: Pre-Synthesized Audio for Templated Coaching Cues
+
+Most spoken cues are templates ("Rep 12, nice work!") or fixed strings emitted
+by the analysis hooks ("Keep your back straight!"). Synthesizing every variant
+from scratch costs a full ElevenLabs round trip each time.
+
+This module synthesizes the reusable pieces once per voice (rep numbers,
+praise words, error phrases), caches them, and assembles a cue by joining the
+cached MP3 data. MP3 is a plain sequence of self-contained frames, so pieces
+with the same output format can be concatenated at frame boundaries without
+decoding or re-encoding: only the ID3 tags and the Xing/Info header frame of
+each piece are dropped, along with any whole trailing frames that the LAME tag
+marks as encoder padding.
+
+Joins are not gapless. Each piece keeps its encoder delay (about 1100 samples,
+~25 ms at 44.1 kHz, which cannot be cut without breaking the first frames) and
+any padding shorter than a frame, so roughly 25-50 ms of silence sits between
+pieces, on top of whatever pause the TTS voice leaves around each phrase.
+
+Rep numbers are cached as whole "Rep N," fragments rather than "Rep" + "N" so
+the number keeps natural intonation.
+"""
+
+import hashlib
+import os
+import random
+import threading
+
+FRAGMENT_CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "tts", "fragments")
+
+# --- Fragment vocabulary ---
+MAX_REP_FRAGMENT = 30
+PRAISE_PHRASES = ["Nice work!", "Excellent work!", "Crushed it!", "Keep it up!", "Great form!"]
+# Must match the strings set by app/hooks/useSquatAnalysis.ts and usePushupAnalysis.ts
+ERROR_PHRASES = ["Keep your back straight!"]
+
+
+def rep_phrase(rep_count):
+    return f"Rep {rep_count},"
+
+
+def all_phrases():
+    return [rep_phrase(n) for n in range(1, MAX_REP_FRAGMENT + 1)] + PRAISE_PHRASES + ERROR_PHRASES
+
+
+def templated_cue(event_type, rep_count, form_error=None):
+    """Returns the fragment phrases for a cue, or None if it needs the LLM."""
+    if event_type == "rep_complete" and 1 <= rep_count <= MAX_REP_FRAGMENT:
+        return [rep_phrase(rep_count), random.choice(PRAISE_PHRASES)]
+    if event_type == "form_error" and form_error in ERROR_PHRASES:
+        return [form_error]
+    return None
+
+# --- MP3 frame handling ---
+
+# Layer III bitrates (kbps) and sample rates (Hz) indexed by header fields
+_BITRATES = {
+    "mpeg1": [0, 32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320],
+    "mpeg2": [0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160],
+}
+_SAMPLE_RATES = {3: [44100, 48000, 32000], 2: [22050, 24000, 16000], 0: [11025, 12000, 8000]}
+
+
+def _frame_length(header):
+    """Length in bytes of the MP3 Layer III frame starting with this 4-byte header, or None."""
+    if len(header) < 4 or header[0] != 0xFF or (header[1] & 0xE0) != 0xE0:
+        return None
+    version = (header[1] >> 3) & 0x03
+    layer = (header[1] >> 1) & 0x03
+    bitrate_index = header[2] >> 4
+    sample_rate_index = (header[2] >> 2) & 0x03
+    padding = (header[2] >> 1) & 0x01
+    if version == 1 or layer != 1 or bitrate_index in (0, 15) or sample_rate_index == 3:
+        return None
+
+    bitrate = _BITRATES["mpeg1" if version == 3 else "mpeg2"][bitrate_index] * 1000
+    sample_rate = _SAMPLE_RATES[version][sample_rate_index]
+    samples_factor = 144 if version == 3 else 72
+    return samples_factor * bitrate // sample_rate + padding
+
+
+def _samples_per_frame(header):
+    return 1152 if (header[1] >> 3) & 0x03 == 3 else 576
+
+
+def _lame_padding(frame):
+    """Encoder padding in samples from the LAME tag of a Xing/Info frame, or 0 if there is none."""
+    for marker in (b"Xing", b"Info"):
+        i = frame.find(marker, 0, 64)
+        if i >= 0:
+            break
+    else:
+        return 0
+    flags = int.from_bytes(frame[i + 4:i + 8], "big")
+    # Optional frame count, byte count, TOC and quality fields precede the LAME tag
+    pos = i + 8 + 4 * bool(flags & 1) + 4 * bool(flags & 2) + 100 * bool(flags & 4) + 4 * bool(flags & 8)
+    tag = frame[pos:pos + 24]
+    if len(tag) < 24 or not tag[:4].isalnum():
+        return 0
+    # Bytes 21-23: 12-bit encoder delay, then 12-bit padding
+    return ((tag[22] & 0x0F) << 8) | tag[23]
+
+
+def mp3_audio_frames(data):
+    """Strips ID3 tags, the Xing/Info header frame and whole padding frames, returning the audio frames.
+
+    Falls back to the untagged bytes if the stream cannot be parsed as Layer III frames.
+    """
+    start, end = 0, len(data)
+    if data[:3] == b"ID3" and len(data) >= 10:
+        size = (data[6] << 21) | (data[7] << 14) | (data[8] << 7) | data[9]
+        start = 10 + size + (10 if data[5] & 0x10 else 0)
+    if end - start >= 128 and data[end - 128:end - 125] == b"TAG":
+        end -= 128
+
+    frames = []
+    padding = 0
+    pos = start
+    while pos < end:
+        length = _frame_length(data[pos:pos + 4])
+        if length is None or pos + length > end:
+            break
+        frame = data[pos:pos + length]
+        # The first frame may be a silent metadata frame holding the total duration of *this* piece
+        if not frames and (b"Xing" in frame[:64] or b"Info" in frame[:64]):
+            padding = _lame_padding(frame)
+            pos += length
+            continue
+        frames.append(frame)
+        pos += length
+
+    if not frames:
+        return data[start:end]
+    # Trailing frames that hold nothing but padding can go; later frames never reference them
+    trailing = min(padding // _samples_per_frame(frames[0]), len(frames) - 1)
+    return b"".join(frames[:len(frames) - trailing])
+
+# --- Fragment engine ---
+
+class CueFragmentEngine:
+    """Caches synthesized fragments per (voice_id, phrase) and assembles cues from them.
+
+    Fragments are also written to cache_dir, keyed by voice, model, output format
+    and phrase, so a restart loads them from disk instead of re-synthesizing.
+    """
+
+    def __init__(self, client, model_id="eleven_turbo_v2", output_format="mp3_44100_128", cache_dir=FRAGMENT_CACHE_DIR):
+        self.client = client
+        self.model_id = model_id
+        # A fixed CBR format keeps every fragment frame-compatible with the others
+        self.output_format = output_format
+        self.cache_dir = cache_dir
+        self.fragments = {}
+        self.in_flight = {}  # (voice_id, phrase) -> Event set once its synthesis finishes
+        self.lock = threading.Lock()
+
+    def cache_path(self, voice_id, phrase):
+        name = hashlib.sha1(phrase.encode("utf-8")).hexdigest()[:16]
+        return os.path.join(self.cache_dir, voice_id, self.model_id, self.output_format, f"{name}.mp3")
+
+    def load_from_disk(self, voice_ids, phrases=None):
+        """Loads previously synthesized fragments into memory. Returns how many were found."""
+        loaded = {}
+        for voice_id in voice_ids:
+            for phrase in phrases or all_phrases():
+                path = self.cache_path(voice_id, phrase)
+                if os.path.exists(path):
+                    with open(path, "rb") as f:
+                        loaded[(voice_id, phrase)] = f.read()
+        with self.lock:
+            self.fragments.update(loaded)
+        print(f"[FRAGMENTS] Loaded {len(loaded)} fragments from {self.cache_dir}")
+        return len(loaded)
+
+    def save_to_disk(self, voice_id, phrase, audio):
+        path = self.cache_path(voice_id, phrase)
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path + ".tmp", "wb") as f:
+                f.write(audio)
+            os.replace(path + ".tmp", path)
+        except OSError as e:
+            print(f"[FRAGMENT ERROR] Could not cache '{phrase}' to disk: {e}")
+
+    def synthesize(self, voice_id, text):
+        audio = self.client.text_to_speech.convert(
+            voice_id=voice_id,
+            text=text,
+            model_id=self.model_id,
+            output_format=self.output_format,
+        )
+        return mp3_audio_frames(b"".join(audio))
+
+    def fragment(self, voice_id, phrase):
+        """Returns a fragment, synthesizing it if needed. Concurrent callers share one synthesis."""
+        key = (voice_id, phrase)
+        while True:
+            with self.lock:
+                if key in self.fragments:
+                    return self.fragments[key]
+                pending = self.in_flight.get(key)
+                if pending is None:
+                    pending = self.in_flight[key] = threading.Event()
+                    break
+            # Another thread is synthesizing it; if that fails, the loop tries again
+            pending.wait()
+
+        try:
+            audio = self.synthesize(voice_id, phrase)
+            self.save_to_disk(voice_id, phrase, audio)
+            with self.lock:
+                self.fragments[key] = audio
+            return audio
+        finally:
+            with self.lock:
+                self.in_flight.pop(key, None)
+            pending.set()
+
+    def cached_cue(self, voice_id, phrases):
+        """Assembles a cue only if every fragment is already cached, otherwise returns None."""
+        with self.lock:
+            pieces = [self.fragments.get((voice_id, phrase)) for phrase in phrases]
+        if any(piece is None for piece in pieces):
+            return None
+        return b"".join(pieces)
+
+    def preload(self, voice_id, phrases=None):
+        """Synthesizes every missing fragment for a voice up front. Errors are logged, not raised."""
+        for phrase in phrases or all_phrases():
+            try:
+                self.fragment(voice_id, phrase)
+            except Exception as e:
+                print(f"[FRAGMENT ERROR] {voice_id} '{phrase}': {e}")
+        with self.lock:
+            count = sum(1 for v, _ in self.fragments if v == voice_id)
+        print(f"[FRAGMENTS] Preloaded {count} fragments for {voice_id}")
+
+    def preload_in_background(self, voice_ids):
+        thread = threading.Thread(target=lambda: [self.preload(v) for v in voice_ids], daemon=True)
+        thread.start()
+        return thread
@@ -0,0 +1,106 @@
+"""
+Fragment Benchmark: Templated Cue Latency, Full Synthesis vs Fragment Assembly
+
+Measures, for a set of templated cues, how long the server takes to have audio
+ready to send:
+
+1. Full synthesis: one ElevenLabs call per cue, timed to first chunk and to
+   last byte.
+2. With --llm, also the whole path /generate-voice-feedback takes without
+   fragments: the Ollama prompt (get_llm_feedback) followed by full synthesis.
+3. Fragment assembly: CueFragmentEngine.cached_cue(), the same call the server
+   makes, with every fragment already cached.
+
+The one-off cost of preloading the fragments is reported separately (fragments
+already cached on disk by the server are loaded instead of re-synthesized).
+
+Usage:
+    python fragment_benchmark.py [voice_id] [--llm]
+"""
+
+import argparse
+import os
+import time
+from elevenlabs import ElevenLabs
+from dotenv import load_dotenv
+
+from cue_fragments import CueFragmentEngine, templated_cue, ERROR_PHRASES
+
+load_dotenv()
+client = ElevenLabs(api_key=os.getenv("ELEVEN_API_KEY"))
+
+CUES = [("rep_complete", n, None) for n in (1, 5, 12)] + [("form_error", 0, e) for e in ERROR_PHRASES]
+
+
+def full_synthesis(engine, voice_id, text):
+    start = time.perf_counter()
+    first_chunk = None
+    size = 0
+    for chunk in client.text_to_speech.convert(
+        voice_id=voice_id, text=text, model_id=engine.model_id, output_format=engine.output_format
+    ):
+        if first_chunk is None:
+            first_chunk = time.perf_counter() - start
+        size += len(chunk)
+    return first_chunk, time.perf_counter() - start, size
+
+
+def llm_and_full_synthesis(engine, voice_id, cue):
+    """The server's non-fragment path: LLM text, then full synthesis of that text."""
+    # Imported here so the default run does not need the server's dependencies
+    from ai_server import FeedbackRequest, get_llm_feedback
+
+    event_type, rep_count, form_error = cue
+    request = FeedbackRequest(
+        eventType=event_type, exercise="squat", angles={"leftKnee": 120, "leftHip": 95},
+        repCount=rep_count, formError=form_error, voice_id=voice_id,
+    )
+    start = time.perf_counter()
+    text = get_llm_feedback(request)
+    llm_time = time.perf_counter() - start
+    first, total, _ = full_synthesis(engine, voice_id, text)
+    return llm_time + first, llm_time + total
+
+
+def fragment_assembly(engine, voice_id, phrases):
+    start = time.perf_counter()
+    audio = engine.cached_cue(voice_id, phrases)
+    return time.perf_counter() - start, audio
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("voice_id", nargs="?", default="cgSgspJ2msm6clMCkdW9")
+    parser.add_argument("--llm", action="store_true", help="also time Ollama + full synthesis")
+    args = parser.parse_args()
+
+    engine = CueFragmentEngine(client)
+    cues = [(cue, templated_cue(*cue)) for cue in CUES]
+
+    needed = sorted({phrase for _, phrases in cues for phrase in phrases})
+    start = time.perf_counter()
+    engine.load_from_disk([args.voice_id], needed)
+    engine.preload(args.voice_id, needed)
+    print(f"[PRELOAD] {len(engine.fragments)} fragments in {time.perf_counter() - start:.2f} s (one-off)\n")
+
+    header = f"{'cue':<32} | {'full first':>10} {'full total':>10} |"
+    if args.llm:
+        header += f" {'llm first':>10} {'llm total':>10} |"
+    print(header + f" {'fragments':>10}")
+    print("-" * len(header + " fragments  "))
+    for cue, phrases in cues:
+        text = " ".join(phrases)
+        try:
+            first, total, _ = full_synthesis(engine, args.voice_id, text)
+            row = f"{text:<32} | {first * 1000:>7.0f} ms {total * 1000:>7.0f} ms |"
+            if args.llm:
+                llm_first, llm_total = llm_and_full_synthesis(engine, args.voice_id, cue)
+                row += f" {llm_first * 1000:>7.0f} ms {llm_total * 1000:>7.0f} ms |"
+        except Exception as e:
+            print(f"[TTS ERROR] {text}: {e}")
+            continue
+        assembled, audio = fragment_assembly(engine, args.voice_id, phrases)
+        if audio is None:
+            print(f"{text:<32} | fragments not cached, the server would fall back to LLM + TTS")
+            continue
+        print(row + f" {assembled * 1000:>7.3f} ms")
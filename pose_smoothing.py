@@ -0,0 +1,116 @@
+"""
+Landmark Smoothing: One-Euro Filter for MediaPipe Pose Streams
+
+MediaPipe landmarks jitter from frame to frame even when the user is standing
+still. The analysis hooks currently hide that jitter by waiting for
+FRAME_CONFIRMATION_THRESHOLD (50) consecutive frames before changing stage,
+which delays every rep and cue by well over a second.
+
+This module smooths the landmark stream *before* angles are computed, using a
+One-Euro filter (Casiez et al., 2012): an adaptive low-pass filter whose cutoff
+rises with the speed of the signal. Slow drift and jitter are filtered heavily,
+fast movements (the actual rep) pass through with little lag.
+
+All 33 landmarks (x, y, z) are filtered at once as a single NumPy array, so a
+frame costs a handful of vector operations instead of 99 scalar filters.
+Visibility scores are passed through untouched.
+"""
+
+import math
+import numpy as np
+
+NUM_LANDMARKS = 33
+COORDS = ("x", "y", "z")
+
+
+def smoothing_factor(dt, cutoff):
+    """Exponential smoothing factor for a low-pass filter with the given cutoff (Hz, scalar or array)."""
+    tau = 1.0 / (2 * math.pi * cutoff)
+    return 1.0 / (1.0 + tau / dt)
+
+
+class LandmarkSmoother:
+    """Streaming One-Euro filter over a (33, 3) array of landmark coordinates.
+
+    min_cutoff: cutoff (Hz) used when landmarks are still. Lower = less jitter, more lag.
+    beta:       how quickly the cutoff rises with landmark speed. Higher = less lag on fast moves.
+    d_cutoff:   cutoff (Hz) for the speed estimate itself.
+
+    Defaults come from `python smoothing_eval.py --sweep`: on top of MediaPipe's
+    own smoothLandmarks filter, a fixed 8 Hz low-pass (beta 0) gave the lowest
+    rep-count delay; adding speed adaptation only added lag.
+    """
+
+    def __init__(self, min_cutoff=8.0, beta=0.0, d_cutoff=1.0):
+        self.min_cutoff = min_cutoff
+        self.beta = beta
+        self.d_cutoff = d_cutoff
+        self.reset()
+
+    def reset(self):
+        self.x_prev = None
+        self.dx_prev = None
+        self.t_prev = None
+
+    def filter(self, t, coords):
+        """Smooths one frame.
+
+        t:      timestamp in seconds (monotonic).
+        coords: array-like of shape (33, 3) with x, y, z per landmark.
+        Returns the smoothed (33, 3) array.
+        """
+        x = np.asarray(coords, dtype=np.float64)
+
+        # A frame with a different landmark count cannot be blended with the old state
+        if self.x_prev is not None and x.shape != self.x_prev.shape:
+            self.reset()
+
+        # Time going backwards means a new stream (e.g. performance.now() after a page reload)
+        if self.t_prev is not None and t < self.t_prev:
+            self.reset()
+
+        if self.t_prev is None:
+            self.x_prev = x.copy()
+            self.dx_prev = np.zeros_like(x)
+            self.t_prev = t
+            return x.copy()
+
+        dt = t - self.t_prev
+        if dt == 0:
+            # Duplicate frame: keep the last estimate
+            return self.x_prev.copy()
+
+        # Filtered speed of every coordinate
+        dx = (x - self.x_prev) / dt
+        a_d = smoothing_factor(dt, self.d_cutoff)
+        dx_hat = a_d * dx + (1 - a_d) * self.dx_prev
+
+        # Per-coordinate adaptive cutoff, then the low-pass step itself
+        cutoff = self.min_cutoff + self.beta * np.abs(dx_hat)
+        a = smoothing_factor(dt, cutoff)
+        x_hat = a * x + (1 - a) * self.x_prev
+
+        self.x_prev = x_hat
+        self.dx_prev = dx_hat
+        self.t_prev = t
+        return x_hat.copy()
+
+    def filter_landmarks(self, t, landmarks):
+        """Smooths a MediaPipe-style list of {x, y, z, visibility} dicts."""
+        coords = [[lm.get(c, 0.0) for c in COORDS] for lm in landmarks]
+        smoothed = self.filter(t, coords)
+        return [
+            {"x": float(sx), "y": float(sy), "z": float(sz), "visibility": lm.get("visibility", 0.0)}
+            for (sx, sy, sz), lm in zip(smoothed, landmarks)
+        ]
+
+
+def calculate_angle(p1, p2, p3):
+    """Angle in degrees at p2, from (..., 2+) arrays. Mirrors calculateAngle in lib/utils.ts."""
+    v1 = np.asarray(p1)[..., :2] - np.asarray(p2)[..., :2]
+    v2 = np.asarray(p3)[..., :2] - np.asarray(p2)[..., :2]
+    dot = np.sum(v1 * v2, axis=-1)
+    mags = np.linalg.norm(v1, axis=-1) * np.linalg.norm(v2, axis=-1)
+    cos_theta = np.divide(dot, mags, out=np.zeros_like(dot), where=mags > 0)
+    angle = np.degrees(np.arccos(np.clip(cos_theta, -1.0, 1.0)))
+    return np.where(mags > 0, angle, 0.0)
@@ -0,0 +1,343 @@
+"""
+Smoothing Evaluation: Rep-Count Accuracy vs Confirmation Window
+
+Replays landmark recordings through a port of the squat hook
+(app/hooks/useSquatAnalysis.ts), once on the landmarks as the hook receives
+them and once after the One-Euro LandmarkSmoother, for a range of
+FRAME_CONFIRMATION_THRESHOLD values. The port keeps the hook's selection
+rules: a knee angle is only used when hip, knee and ankle have visibility
+> 0.5, one leg is used when only that leg is available, and frames with no
+usable knee angle are skipped.
+
+Input:
+- Recorded sessions as JSON files, captured from the app (so MediaPipe's own
+  smoothLandmarks filter is already applied):
+    {"reps": 10, "frames": [{"t": <ms>, "landmarks": [{x, y, z, visibility} * 33]}, ...]}
+- With no files given, a set of synthetic squat sessions is generated instead
+  (side view at 60 fps, detector jitter that is heavier and less visible on
+  the occluded far-side leg, plus short tracking glitches on that leg). These
+  are passed through an approximation of MediaPipe's landmark smoothing, since
+  usePoseEstimation.ts runs Pose with smoothLandmarks: true.
+
+Output:
+- For each window: fraction of sessions counted exactly, and the mean delay
+  between the user actually standing up and the rep being counted.
+- A summary against the true rep count: the smallest window at which raw and
+  smoothed landmarks count every session exactly, with both shown side by
+  side at those windows.
+- With --sweep: the smallest 100%-exact window and its delay for a grid of
+  min_cutoff / beta settings, and the setting with the lowest delay.
+
+Usage:
+    python smoothing_eval.py                      # synthetic sessions
+    python smoothing_eval.py --sweep              # tune the smoother
+    python smoothing_eval.py session1.json ...    # recorded sessions
+"""
+
+import argparse
+import json
+import math
+import numpy as np
+
+from pose_smoothing import LandmarkSmoother, calculate_angle, NUM_LANDMARKS
+
+# Same values as useSquatAnalysis.ts
+STANDING_THRESHOLD = 160
+SQUAT_THRESHOLD = 100
+VISIBILITY_THRESHOLD = 0.5
+HOOK_WINDOW = 50  # FRAME_CONFIRMATION_THRESHOLD used by the hooks today
+WINDOWS = [1, 2, 3, 5, 8, 10, 15, 20, 30, 50]
+
+# Grid for --sweep
+SWEEP_MIN_CUTOFFS = [0.5, 1.0, 2.0, 4.0, 8.0, 16.0]
+SWEEP_BETAS = [0.0, 0.5, 1.0, 2.0, 5.0]
+
+LEFT_SHOULDER, RIGHT_SHOULDER = 11, 12
+LEFT_HIP, RIGHT_HIP = 23, 24
+LEFT_KNEE, RIGHT_KNEE = 25, 26
+LEFT_ANKLE, RIGHT_ANKLE = 27, 28
+
+# ------------------- Recordings -------------------
+
+def load_recording(path):
+    with open(path) as f:
+        data = json.load(f)
+    frames = data["frames"]
+    times = np.array([frame["t"] for frame in frames], dtype=np.float64) / 1000.0
+    coords = np.array([[[lm["x"], lm["y"], lm["z"]] for lm in frame["landmarks"]] for frame in frames], dtype=np.float64)
+    visibility = np.array([[lm.get("visibility", 0.0) for lm in frame["landmarks"]] for frame in frames], dtype=np.float64)
+    return {"name": path, "reps": data["reps"], "times": times, "coords": coords, "visibility": visibility}
+
+
+def rotate(v, degrees):
+    r = math.radians(degrees)
+    return np.array([v[0] * math.cos(r) - v[1] * math.sin(r), v[0] * math.sin(r) + v[1] * math.cos(r)])
+
+
+def synthetic_pose(knee_angle):
+    """Side-view squat pose with both hip and knee angles equal to knee_angle (good form)."""
+    ankle = np.array([0.5, 0.9])
+    lean = (180 - knee_angle) / 2
+    knee = ankle + 0.2 * rotate(np.array([0.0, -1.0]), lean)      # shin tilts forward
+    hip = knee + 0.2 * rotate((ankle - knee) / 0.2, knee_angle)    # thigh folds back
+    shoulder = hip + 0.3 * rotate((knee - hip) / 0.2, -knee_angle) # torso folds forward
+    return shoulder, hip, knee, ankle
+
+
+def mediapipe_smoothing(times, coords, visibility):
+    """Approximates Pose's smoothLandmarks stage.
+
+    MediaPipe runs a One-Euro filter (min_cutoff 0.05, beta 80, derivative
+    cutoff 1) on speeds measured in body sizes per second, and low-passes
+    visibility with alpha 0.1. Dividing by the body size before filtering and
+    multiplying back gives the same speed scaling.
+    """
+    body_size = np.median((np.ptp(coords[:, :, 0], axis=1) + np.ptp(coords[:, :, 1], axis=1)) / 2)
+    upstream = LandmarkSmoother(min_cutoff=0.05, beta=80.0, d_cutoff=1.0)
+    smoothed = np.stack([upstream.filter(t, frame / body_size) for t, frame in zip(times, coords)]) * body_size
+
+    smoothed_visibility = np.empty_like(visibility)
+    smoothed_visibility[0] = visibility[0]
+    for i in range(1, len(visibility)):
+        smoothed_visibility[i] = 0.1 * visibility[i] + 0.9 * smoothed_visibility[i - 1]
+    return smoothed, smoothed_visibility
+
+
+def synthetic_session(rng, reps=10, fps=60, noise=0.01, occluded_noise=0.03, glitch_rate=0.01, glitch_scale=0.15):
+    """Generates one jittery squat session and its true standing-up times.
+
+    The camera sees the left side, so the right (far, occluded) leg jitters more,
+    is the one that glitches, and reports lower visibility, so the hook drops it
+    on some frames. Holds last 1.0-2.0 s at the top and 1.0-1.5 s at the bottom,
+    longer than 50 frames at 60 fps; jitter that pushes frames back across the
+    thresholds can still make large windows miss reps.
+    """
+    dt = 1.0 / fps
+    keyframes = [(0.0, 175.0)]
+    t = rng.uniform(1.0, 2.0)
+    stand_times = []
+    for _ in range(reps):
+        down, bottom, up, top = rng.uniform(0.8, 1.3), rng.uniform(1.0, 1.5), rng.uniform(0.7, 1.2), rng.uniform(1.0, 2.0)
+        depth = rng.uniform(70, 90)
+        keyframes += [(t, 175.0), (t + down, depth), (t + down + bottom, depth), (t + down + bottom + up, 175.0)]
+        # The moment the knee passes the standing threshold on the way up
+        frac = (STANDING_THRESHOLD - depth) / (175.0 - depth)
+        stand_times.append(t + down + bottom + frac * up)
+        t += down + bottom + up + top
+    keyframes.append((t + 1.0, 175.0))
+
+    key_t, key_a = zip(*keyframes)
+    times = np.arange(0.0, key_t[-1], dt)
+    knee_angles = np.interp(times, key_t, key_a)
+
+    base = rng.uniform(0.2, 0.8, size=(NUM_LANDMARKS, 3))
+    coords = np.repeat(base[None], len(times), axis=0)
+    for i, angle in enumerate(knee_angles):
+        shoulder, hip, knee, ankle = synthetic_pose(angle)
+        for left, right, point in [
+            (LEFT_SHOULDER, RIGHT_SHOULDER, shoulder), (LEFT_HIP, RIGHT_HIP, hip),
+            (LEFT_KNEE, RIGHT_KNEE, knee), (LEFT_ANKLE, RIGHT_ANKLE, ankle),
+        ]:
+            coords[i, left, :2] = point
+            coords[i, right, :2] = point + [0.01, 0.0]
+
+    occluded = [RIGHT_HIP, RIGHT_KNEE, RIGHT_ANKLE]
+    visibility = rng.uniform(0.9, 1.0, size=coords.shape[:2])
+    visibility[:, occluded] = np.clip(rng.normal(0.6, 0.15, size=(len(times), len(occluded))), 0.0, 1.0)
+
+    coords += rng.normal(0.0, noise, size=coords.shape)
+    coords[:, occluded] += rng.normal(0.0, occluded_noise, size=(len(times), len(occluded), 3))
+    # Tracking glitches: an occluded landmark jumps away for a few frames, then snaps back.
+    # MediaPipe is not always aware of it, so visibility only sometimes drops.
+    for start in np.flatnonzero(rng.random(len(times)) < glitch_rate):
+        landmark = rng.choice(occluded)
+        end = start + rng.integers(2, 8)
+        coords[start:end, landmark] += rng.normal(0.0, glitch_scale, size=3)
+        visibility[start:end, landmark] = rng.uniform(0.3, 0.9)
+
+    coords, visibility = mediapipe_smoothing(times, coords, visibility)
+    return {"name": "synthetic", "reps": reps, "times": times, "coords": coords,
+            "visibility": visibility, "stand_times": stand_times}
+
+# ------------------- Analysis -------------------
+
+def knee_angles(coords, visibility):
+    """Active knee angle per frame, with the squat hook's visibility and leg selection rules (0 = unusable)."""
+    def leg(hip, knee, ankle):
+        visible = np.all(visibility[:, [hip, knee, ankle]] > VISIBILITY_THRESHOLD, axis=1)
+        return np.where(visible, calculate_angle(coords[:, hip], coords[:, knee], coords[:, ankle]), 0.0)
+
+    left = leg(LEFT_HIP, LEFT_KNEE, LEFT_ANKLE)
+    right = leg(RIGHT_HIP, RIGHT_KNEE, RIGHT_ANKLE)
+    both = (left > 0) & (right > 0)
+    return np.where(both, (left + right) / 2, np.where(left > 0, left, right))
+
+
+def smooth(times, coords, smoother):
+    smoother.reset()
+    return np.stack([smoother.filter(t, frame) for t, frame in zip(times, coords)])
+
+
+def count_reps(angles, times, window):
+    """Port of the useSquatAnalysis.ts state machine. Returns rep count and the times reps were counted."""
+    stage, up_frames, down_frames = "up", 0, 0
+    counted_at = []
+    for angle, t in zip(angles, times):
+        if angle == 0:
+            continue  # no usable knee angle this frame, the hook returns early
+        if angle > STANDING_THRESHOLD:
+            if up_frames > window and stage == "down":
+                stage = "up"
+                counted_at.append(t)
+            up_frames += 1
+            down_frames = 0
+        elif angle < SQUAT_THRESHOLD:
+            if down_frames > window and stage == "up":
+                stage = "down"
+            down_frames += 1
+            up_frames = 0
+    return len(counted_at), counted_at
+
+
+def mean_delay_ms(session, counted_at):
+    """Mean delay from each true stand-up to the next counted rep (synthetic sessions only)."""
+    stand_times = session.get("stand_times")
+    if not stand_times or len(counted_at) != len(stand_times):
+        return None
+    return 1000 * float(np.mean(np.array(counted_at) - np.array(stand_times)))
+
+
+def score(sessions, all_angles, window):
+    exact, delays = 0, []
+    for session, angles in zip(sessions, all_angles):
+        count, counted_at = count_reps(angles, session["times"], window)
+        exact += count == session["reps"]
+        delay = mean_delay_ms(session, counted_at)
+        if delay is not None:
+            delays.append(delay)
+    return exact / len(sessions), float(np.mean(delays)) if delays else None
+
+
+def evaluate(sessions, smoother, raw_angles=None):
+    """Scores raw and smoothed landmarks at every window. Returns {window: {"raw": ..., "smoothed": ...}}."""
+    if raw_angles is None:
+        raw_angles = [knee_angles(s["coords"], s["visibility"]) for s in sessions]
+    smooth_angles = [knee_angles(smooth(s["times"], s["coords"], smoother), s["visibility"]) for s in sessions]
+    return {
+        window: {"raw": score(sessions, raw_angles, window), "smoothed": score(sessions, smooth_angles, window)}
+        for window in WINDOWS
+    }
+
+
+def fmt(accuracy, delay):
+    return f"{accuracy:.0%} exact, {f'{delay:.0f} ms' if delay is not None else '-'}"
+
+
+def print_table(results):
+    print(f"{'window':>6} | {'raw exact':>9} {'raw delay':>10} | {'smoothed exact':>14} {'smoothed delay':>14}")
+    print("-" * 64)
+    for window, row in results.items():
+        (raw_acc, raw_delay), (smooth_acc, smooth_delay) = row["raw"], row["smoothed"]
+        print(f"{window:>6} | {raw_acc:>9.0%} {f'{raw_delay:.0f} ms' if raw_delay is not None else '-':>10} | "
+              f"{smooth_acc:>14.0%} {f'{smooth_delay:.0f} ms' if smooth_delay is not None else '-':>14}")
+
+
+def exact_window(results, label):
+    """Smallest window at which every session is counted exactly, or None."""
+    return min((w for w, row in results.items() if row[label][0] == 1.0), default=None)
+
+
+def summarize(results):
+    """Compares raw and smoothed landmarks against the true rep count, side by side at the same windows."""
+    raw_window, smooth_window = exact_window(results, "raw"), exact_window(results, "smoothed")
+    print()
+    print(f"[RAW]      100% exact from window {raw_window if raw_window is not None else 'never'}")
+    print(f"[SMOOTHED] 100% exact from window {smooth_window if smooth_window is not None else 'never'}")
+    for window in sorted({w for w in (raw_window, smooth_window) if w is not None}):
+        row = results[window]
+        print(f"  window {window:>2}: raw {fmt(*row['raw'])} | smoothed {fmt(*row['smoothed'])}")
+
+    if raw_window is None and smooth_window is None:
+        print(f"[RESULT] Neither reaches 100% exact at any window up to {HOOK_WINDOW}.")
+        return
+    smoother_wins = smooth_window is not None and (
+        raw_window is None
+        or (smooth_window < raw_window and results[smooth_window]["smoothed"][1] <= results[raw_window]["raw"][1])
+    )
+    if smoother_wins:
+        print(f"[RESULT] Smoothing counts every rep at window {smooth_window} with less delay than raw landmarks need.")
+    else:
+        print(f"[RESULT] Smoothing does not beat raw landmarks here: lower FRAME_CONFIRMATION_THRESHOLD "
+              f"from {HOOK_WINDOW} to {raw_window} instead.")
+
+
+def sweep(sessions):
+    """Smallest 100%-exact window and its delay for each min_cutoff / beta pair.
+
+    The recommended setting is the one with the lowest delay at its 100%-exact
+    window, since delay is what the user notices; the window is only the means.
+    """
+    raw_angles = [knee_angles(s["coords"], s["visibility"]) for s in sessions]
+    print(f"{'min_cutoff':>10} {'beta':>5} | {'100% from':>9} {'delay':>8}")
+    print("-" * 40)
+    best, smallest = None, None
+    for min_cutoff in SWEEP_MIN_CUTOFFS:
+        for beta in SWEEP_BETAS:
+            results = evaluate(sessions, LandmarkSmoother(min_cutoff=min_cutoff, beta=beta), raw_angles)
+            window = exact_window(results, "smoothed")
+            delay = results[window]["smoothed"][1] if window is not None else None
+            print(f"{min_cutoff:>10} {beta:>5} | {window if window is not None else 'never':>9} "
+                  f"{f'{delay:.0f} ms' if delay is not None else '-':>8}")
+            if window is None:
+                continue
+            if best is None or (delay, window) < best[:2]:
+                best = (delay, window, min_cutoff, beta)
+            if smallest is None or (window, delay) < smallest[:2]:
+                smallest = (window, delay, min_cutoff, beta)
+
+    raw_window = exact_window(results, "raw")
+    raw_delay = results[raw_window]["raw"][1] if raw_window is not None else None
+    print()
+    print(f"[RAW]  100% exact from window {raw_window if raw_window is not None else 'never'}"
+          f"{f' ({raw_delay:.0f} ms)' if raw_delay is not None else ''}")
+    if best is None:
+        print("[BEST] no setting reaches 100% exact")
+        return
+    print(f"[SMALLEST WINDOW] min_cutoff={smallest[2]}, beta={smallest[3]}: "
+          f"100% exact from window {smallest[0]} ({smallest[1]:.0f} ms)")
+    print(f"[LOWEST DELAY]    min_cutoff={best[2]}, beta={best[3]}: 100% exact from window {best[1]} ({best[0]:.0f} ms)")
+    if raw_delay is not None and best[0] >= raw_delay:
+        print(f"[RESULT] No setting beats raw landmarks on delay: lower FRAME_CONFIRMATION_THRESHOLD "
+              f"from {HOOK_WINDOW} to {raw_window} instead.")
+
+# ------------------- Main -------------------
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("recordings", nargs="*", help="recorded session JSON files")
+    parser.add_argument("--sessions", type=int, default=60, help="number of synthetic sessions")
+    parser.add_argument("--fps", type=int, default=60, help="frame rate of synthetic sessions")
+    parser.add_argument("--noise", type=float, default=0.01, help="detector jitter (std, normalized units)")
+    parser.add_argument("--occluded-noise", type=float, default=0.03, help="extra jitter on the far-side leg")
+    parser.add_argument("--glitch-rate", type=float, default=0.01, help="per-frame chance of a tracking glitch")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--min-cutoff", type=float, default=LandmarkSmoother().min_cutoff)
+    parser.add_argument("--beta", type=float, default=LandmarkSmoother().beta)
+    parser.add_argument("--sweep", action="store_true", help="grid-search min_cutoff and beta instead")
+    args = parser.parse_args()
+
+    if args.recordings:
+        sessions = [load_recording(path) for path in args.recordings]
+    else:
+        rng = np.random.default_rng(args.seed)
+        sessions = [synthetic_session(
+            rng, fps=args.fps, noise=args.noise, occluded_noise=args.occluded_noise, glitch_rate=args.glitch_rate
+        ) for _ in range(args.sessions)]
+
+    print(f"Evaluating {len(sessions)} session(s).\n")
+    if args.sweep:
+        sweep(sessions)
+    else:
+        results = evaluate(sessions, LandmarkSmoother(min_cutoff=args.min_cutoff, beta=args.beta))
+        print_table(results)
+        summarize(results)